@@ -1,6 +1,7 @@
 from dataclasses import dataclass
 from datetime import datetime
 from uuid import UUID
+import inspect
 
 @dataclass(frozen=True)
 class TransactionRequested:
@@ -41,6 +42,11 @@ except FrozenInstanceError:
 class EventMetaclass(type):
     def __new__(cls,*args,**kwargs):
         new_cls = super().__new__(cls,*args,**kwargs)
+        #Subclass adding no fields reuses the inherited dataclass machinery
+        if not inspect.get_annotations(new_cls) and any(
+            hasattr(base,"__dataclass_fields__") for base in new_cls.__bases__
+        ):
+            return new_cls
         return dataclass(frozen=True,kw_only=True)(new_cls)
     
 class DomainEvent(metaclass=EventMetaclass):
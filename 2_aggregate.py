@@ -1,26 +1,227 @@
 from __future__ import annotations
-from dataclasses import dataclass,field
+from dataclasses import MISSING,dataclass,field,fields
 from decimal import Decimal
-from typing import Type
-from uuid import UUID, uuid4
+from typing import Any, Callable, ClassVar, Type
+from uuid import UUID
 from datetime import datetime
-from collections import deque
+from time import time_ns
+from operator import attrgetter
+import functools
 import importlib
+import keyword
+import os
+
+
+def _make_event_projection(cls:type,sets:dict[str,str],generic_mutate):
+    """
+    Generates apply() and mutate() for an event whose projection is a set
+    of plain assignments, declared as {aggregate attribute: event field}.
+    """
+    for attr, name in sets.items():
+        for identifier in (attr,name):
+            if not identifier.isidentifier() or keyword.iskeyword(identifier):
+                raise TypeError(f"{cls.__qualname__}._sets_: bad name {identifier!r}")
+    #Fields are not collected by dataclass yet, so read them off the declarations
+    declared = {*getattr(cls,"__dataclass_fields__",()), *cls.__dict__.get("__annotations__",())}
+    for name in sets.values():
+        if name not in declared:
+            raise TypeError(f"{cls.__qualname__}._sets_: {name!r} is not a field")
+    assigns = [f"obj.{attr} = self.{name}" for attr, name in sets.items()]
+    apply = _create_fn(cls,"apply","self,obj",assigns,{})
+    body = [
+        "version = self.aggregate_version",
+        "try:",
+        "  current = obj.version",
+        "except AttributeError:",
+        "  return _generic_mutate(self,obj)",
+        "if version != current + 1:",
+        "  raise obj.VersionError(version, current + 1)",
+        "obj.version = version",
+        "obj.timestamp = self.timestamp",
+        *assigns,
+        "return obj",
+    ]
+    mutate = _create_fn(cls,"mutate","self,obj",body,{"_generic_mutate": generic_mutate})
+    mutate._generic_mutate_ = generic_mutate
+    return apply, mutate
+
+def _rebind_class_cells(old_cls:type,new_cls:type) -> None:
+    """
+    dataclass(slots=True) returns a new class, but closures made for the old
+    one (zero-arg super(), the frozen __setattr__) still point at it.
+    """
+    for attr in new_cls.__dict__.values():
+        if isinstance(attr,(classmethod,staticmethod)):
+            attr = attr.__func__
+        elif isinstance(attr,property):
+            attr = attr.fget
+        for cell in getattr(attr,"__closure__",None) or ():
+            if cell.cell_contents is old_cls:
+                cell.cell_contents = new_cls
+
+
+def _create_fn(cls:type,name:str,args:str,body:list[str],local_vars:dict):
+    """
+    Compiles a method for cls from source lines, binding local_vars
+    through a closure as dataclasses does for its generated methods.
+    """
+    source = (
+        f"def __create_fn__({', '.join(local_vars)}):\n"
+        f" def {name}({args}):\n"
+        + "\n".join(f"  {line}" for line in body or ["pass"])
+        + f"\n return {name}"
+    )
+    namespace = {}
+    exec(source, {}, namespace)
+    fn = namespace["__create_fn__"](**local_vars)
+    fn.__qualname__ = f"{cls.__qualname__}.{name}"
+    return fn
+
+def _slot_setters(cls:type) -> dict[str,Callable[[Any,Any],None]]:
+    """
+    Maps "_set_<field>" to the __set__ of the field's slot descriptor,
+    so generated code assigns without the frozen __setattr__ or an MRO walk.
+    """
+    setters = {}
+    for name in cls._field_names_:
+        for klass in cls.__mro__:
+            if name in klass.__dict__:
+                setters[f"_set_{name}"] = klass.__dict__[name].__set__
+                break
+    return setters
+
+def _make_event_init(cls:type):
+    """
+    Generates a keyword-only __init__ for a frozen event class.
+    Returns None when the dataclass-generated one must be kept.
+    """
+    if hasattr(cls,"__post_init__"):
+        return None
+    params, body = [], []
+    local_vars = _slot_setters(cls)
+    for f in fields(cls):
+        if not f.init or f.default_factory is not MISSING:
+            return None
+        if f.default is MISSING:
+            params.append(f.name)
+        else:
+            local_vars[f"_dflt_{f.name}"] = f.default
+            params.append(f"{f.name}=_dflt_{f.name}")
+        body.append(f"_set_{f.name}(self,{f.name})")
+    return _create_fn(cls,"__init__",f"self,*,{','.join(params)}",body,local_vars)
+
+def _make_event_from_row(cls:type):
+    """
+    Generates the _from_row_ classmethod, which rebuilds an event from
+    the tuple made by _to_row_ without parsing keyword arguments.
+    """
+    values = [f"_v{i}" for i in range(len(cls._field_names_))]
+    body = [
+        f"({', '.join(values)},) = row",
+        "event = _new(cls)",
+        *(f"_set_{name}(event,{value})" for name, value in zip(cls._field_names_, values)),
+        "return event",
+    ]
+    local_vars = {"_new": object.__new__, **_slot_setters(cls)}
+    return classmethod(_create_fn(cls,"_from_row_","cls,row",body,local_vars))
+
+
+#Projection functions of event classes, looked up by the exact event type.
+#EventMetaclass refreshes them when apply() is rebound on a class.
+_APPLY_HANDLERS: dict[type, Callable[[Any, Any], None]] = {}
+
+def _refresh_apply_handlers(cls:type) -> None:
+    """
+    Re-reads apply() for cls and the subclasses inheriting it from cls
+    """
+    pending = [cls]
+    while pending:
+        klass = pending.pop()
+        #An override below cls shields klass and its subclasses
+        if klass is not cls and "apply" in klass.__dict__:
+            continue
+        if klass in _APPLY_HANDLERS:
+            _APPLY_HANDLERS[klass] = klass.apply
+            #A generated mutate() inlines the old apply()
+            generic = getattr(klass.mutate,"_generic_mutate_",None)
+            if generic is not None:
+                klass.mutate = generic
+        pending.extend(type.__subclasses__(klass))
 
 
 class EventMetaclass(type):
-    def __new__(cls,*args,**kwargs):
-        new_cls = super().__new__(cls,*args,**kwargs)
-        return dataclass(frozen=True,kw_only=True)(new_cls)
-    
+    def __new__(cls,name,bases,namespace,**kwargs):
+        #dataclass(slots=True) rebuilding the class
+        if "__dataclass_fields__" in namespace:
+            new_cls = super().__new__(cls,name,bases,namespace,**kwargs)
+
+        #Slots are derived from the fields, so they cannot be declared
+        elif "__slots__" in namespace:
+            raise TypeError(f"{name} must not declare __slots__; event fields become slots")
+
+        #Subclass adding no fields reuses the inherited dataclass machinery
+        elif "__annotations__" not in namespace and any(
+            hasattr(base,"__dataclass_fields__") for base in bases
+        ):
+            namespace["__slots__"] = ()
+            new_cls = super().__new__(cls,name,bases,namespace,**kwargs)
+
+        else:
+            old_cls = super().__new__(cls,name,bases,namespace,**kwargs)
+            new_cls = dataclass(frozen=True,kw_only=True,slots=True)(old_cls)
+            _rebind_class_cells(old_cls,new_cls)
+            new_cls._field_names_ = tuple(f.name for f in fields(new_cls))
+            new_cls._prepare_fields_()
+            new_cls._row_getter_ = attrgetter(*new_cls._field_names_)
+            new_cls._from_row_ = _make_event_from_row(new_cls)
+            init = _make_event_init(new_cls)
+            if init is not None:
+                new_cls.__init__ = init
+
+        apply = getattr(new_cls,"apply",None)
+        if apply is not None:
+            _APPLY_HANDLERS[new_cls] = apply
+        return new_cls
+
+    def __setattr__(cls,name,value):
+        super().__setattr__(name,value)
+        if name == "apply" and cls in _APPLY_HANDLERS:
+            _refresh_apply_handlers(cls)
+
+    def __delattr__(cls,name):
+        super().__delattr__(name)
+        if name == "apply" and cls in _APPLY_HANDLERS:
+            _refresh_apply_handlers(cls)
+
 class DomainEvent(metaclass=EventMetaclass):
     aggregate_id: UUID
     aggregate_version: int
-    timestamp : datetime
+    timestamp : int #Nanoseconds since the epoch
+
+    @property
+    def timestamp_dt(self) -> datetime:
+        return datetime.fromtimestamp(self.timestamp / 1e9)
+
+    def _to_row_(self) -> tuple:
+        """
+        Returns the field values in field order, as stored in the event log
+        """
+        return self._row_getter_(self)
+
+    #_from_row_(row), its inverse, is generated per class by EventMetaclass
+
+    @classmethod
+    def _prepare_fields_(cls) -> None:
+        """
+        Called by EventMetaclass once the dataclass fields of cls are known
+        """
 
 
 
 #Helper functions
+#Aggregate classes by topic, filled in as they are defined
+_AGGREGATE_REGISTRY: dict[str, type] = {}
+
 def get_topic(cls:type) -> str:
     """
     Returns a string that locates the given class
@@ -31,23 +232,66 @@ def resolve_topic(topic:str):
     """
     Returns a class located by the given string
     """
+    try:
+        return _AGGREGATE_REGISTRY[topic]
+    except KeyError:
+        return _import_topic(topic)
+
+@functools.lru_cache(maxsize=None)
+def _import_topic(topic:str):
+    """
+    Imports the class of a topic outside the registry.
+    Topics never change once issued, so the lookup is cached.
+    """
     module_name, _,class_name =topic.partition("#")
     module = importlib.import_module(module_name)
     return resolve_attr(module,class_name)
 
 def resolve_attr(obj,path:str) -> type:
-    #Base Case
     if not path:
         return obj
-    
-    #Recursive Case
-    else:
-        head,_,tail = path.partition(".")
-        obj = getattr(obj,head)
-        return resolve_attr(obj,tail)
+    #Walk the dotted path, e.g. "Account.Opened"
+    for name in path.split("."):
+        obj = getattr(obj,name)
+    return obj
+
+
+class PooledUUID4:
+    """
+    Makes version 4 UUIDs out of one pooled os.urandom() read,
+    instead of one read per UUID as uuid4() does
+    """
+    def __init__(self,pool_size:int=4096):
+        self._pool_size = pool_size - pool_size % 16
+        self._chunks: list[bytes] = []
+        #A forked child must not hand out the parent's remaining bytes
+        if hasattr(os,"register_at_fork"):
+            os.register_at_fork(after_in_child=self._chunks.clear)
+
+    def __call__(self) -> UUID:
+        #list.pop() is atomic, so threads never share a chunk
+        try:
+            chunk = self._chunks.pop()
+        except IndexError:
+            pool = os.urandom(self._pool_size)
+            chunks = [pool[i:i + 16] for i in range(16,self._pool_size,16)]
+            self._chunks.extend(chunks)
+            chunk = pool[:16]
+        return UUID(bytes=chunk,version=4)
+
+pooled_uuid4 = PooledUUID4()
+
 
+def aggregate_dataclass(cls:type) -> type:
+    """
+    dataclass(slots=True) for aggregate classes, keeping zero-arg super() working
+    """
+    new_cls = dataclass(slots=True)(cls)
+    _rebind_class_cells(cls,new_cls)
+    return new_cls
 
-@dataclass
+
+@aggregate_dataclass
 class Aggregate:
     class NotAggregateError(Exception):
         pass
@@ -56,26 +300,48 @@ class Aggregate:
     
 
     class Event(DomainEvent):
+        def __init_subclass__(cls, **kwargs):
+            super().__init_subclass__(**kwargs)
+            #Events declaring _sets_ get apply() and mutate() generated,
+            #with the assignments inlined instead of dispatched
+            sets = cls.__dict__.get("_sets_")
+            #When dataclass(slots=True) rebuilds cls, this has already run
+            if "__dataclass_fields__" in cls.__dict__:
+                return
+            #Generated mutate() remembers the generic one it stands in for
+            generic = getattr(cls.mutate,"_generic_mutate_",cls.mutate)
+            if sets is None:
+                #A hand-written apply() must not be bypassed by the
+                #mutate() generated for a parent's _sets_
+                if "apply" in cls.__dict__ and generic is not cls.mutate:
+                    cls.mutate = generic
+                return
+            if "apply" in cls.__dict__:
+                raise TypeError(f"{cls.__qualname__} defines both _sets_ and apply()")
+            if generic is not __class__.mutate:
+                raise TypeError(f"{cls.__qualname__} overrides mutate(), so _sets_ cannot apply")
+            cls.apply, cls.mutate = _make_event_projection(cls,sets,generic)
+
         def mutate(self,obj:"Aggregate"|None) -> "Aggregate":
             """
             Changes the state of the aggregate
             according to domain event attriutes. 
             """
             #Check sequence
-            if not isinstance(obj,Aggregate):
-                raise Aggregate.NotAggregateError
-            next_version = obj.version +1 
-            if self.aggregate_version != next_version:
-                raise obj.VersionError(
-                    self.aggregate_version, next_version
-                )
+            version = self.aggregate_version
+            try:
+                current = obj.version
+            except AttributeError:
+                raise Aggregate.NotAggregateError from None
+            if version != current + 1:
+                raise obj.VersionError(version, current + 1)
             #Update aggregate version #? Guess it should be encapsulated in apply method?
-            obj.version = next_version
+            obj.version = version
 
             obj.timestamp = self.timestamp
 
             #Project obj 
-            self.apply(obj)
+            _APPLY_HANDLERS[type(self)](self,obj)
             return obj 
 
         def apply(self,obj) -> None:
@@ -87,16 +353,37 @@ class Aggregate:
         """
 
         aggregate_topic : str
+
+        #Fields declared by subclasses, passed on to the aggregate constructor
+        _extra_fields_ = ()
+
+        @classmethod
+        def _prepare_fields_(cls) -> None:
+            base = __class__._field_names_
+            cls._extra_fields_ = tuple(
+                name for name in cls._field_names_ if name not in base
+            )
+
         def mutate(self, obj: "Aggregate"|None) -> "Aggregate":
-            #Copy the event attributes
-            kwargs = self.__dict__.copy()
-            id = kwargs.pop("aggregate_id")
-            version = kwargs.pop("aggregate_version")
+            #Get the root class from topic, using helper function
+            aggregate_class = resolve_topic(self.aggregate_topic)
+            extra = {name: getattr(self, name) for name in self._extra_fields_}
+            return aggregate_class(
+                id=self.aggregate_id,
+                version=self.aggregate_version,
+                timestamp=self.timestamp,
+                **extra
+            )
 
-            #Get the root class from topicm, using helper function
-            aggregate_class = resolve_topic(kwargs.pop("aggregate_topic"))
+    #Sources of timestamps and ids, replaceable per aggregate class
+    _clock = staticmethod(time_ns)
+    _id_factory = staticmethod(pooled_uuid4)
 
-            return aggregate_class(id=id,version=version,**kwargs)
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        #Resolved once per class instead of on every _create_
+        cls.__aggregate_topic__ = get_topic(cls)
+        _AGGREGATE_REGISTRY[cls.__aggregate_topic__] = cls
 
     @classmethod
     def _create_(
@@ -105,18 +392,42 @@ class Aggregate:
         **kwargs,
     ):
         event = event_class(
-            aggregate_id = uuid4(), # Should it be managed on application?
+            aggregate_id = cls._id_factory(), # Should it be managed on application?
             aggregate_version = 1,
-            aggregate_topic = get_topic(cls),
-            timestamp=datetime.now(),
+            aggregate_topic = cls.__aggregate_topic__,
+            timestamp=cls._clock(),
             **kwargs
         )
 
         #Call Aggregate.Created.mutate
         aggregate = event.mutate(None)
-        aggregate.pending_events.append(event)
+        aggregate.pending_events = [event]
         return aggregate
 
+    def _next_event_(
+        self,
+        event_class: Type["Aggregate.Event"],
+        **kwargs,
+    )->"Aggregate.Event":
+        """
+        Builds a domain event of given type for the next version of this aggregate
+        """
+        return event_class(
+            aggregate_id = self.id,
+            aggregate_version = self.version +1,
+            timestamp= self._clock(),
+            **kwargs,
+        )
+
+    def _record_(self,event:"Aggregate.Event")->None:
+        """
+        Appends the domain event to pending events
+        """
+        if self.pending_events is None:
+            self.pending_events = [event]
+        else:
+            self.pending_events.append(event)
+
     def _trigger_(
         self,
         event_class: Type["Aggregate.Event"],
@@ -126,62 +437,94 @@ class Aggregate:
         Triggers domain event of given type,
         extending the sequence of domain events for this aggregate object
         """
-        next_version = self.version +1
-        try:
-            event = event_class(
-                aggregate_id = self.id,
-                aggregate_version = next_version,
-                timestamp= datetime.now(),
-                **kwargs,
-            )
-        except AttributeError:
-            raise
+        event = self._next_event_(event_class,**kwargs)
         #Mutate aggregate with domain event
         event.mutate(self)
+        self._record_(event)
 
-        #Append the domain event to pending events
-        self.pending_events.append(event)
+    def _apply_and_record_(
+        self,
+        event_class: Type["Aggregate.Event"],
+        **kwargs,
+    )->None:
+        """
+        Fast path of _trigger_ for events whose projection is all in apply().
+        The event is built for the next version, so the sequence
+        check in mutate() is skipped. Events overriding mutate() take _trigger_.
+        """
+        mutate = event_class.mutate
+        if mutate is not Aggregate.Event.mutate and not hasattr(mutate,"_generic_mutate_"):
+            return self._trigger_(event_class,**kwargs)
+        event = self._next_event_(event_class,**kwargs)
+        self.version = event.aggregate_version
+        self.timestamp = event.timestamp
+        _APPLY_HANDLERS[event_class](event,self)
+        self._record_(event)
 
     def _collect_(self) -> list[Event]:
         """
         Collect pending events
         """
-        collected = []
-        while self.pending_events:
-            collected.append(self.pending_events.popleft())
-        return collected
+        collected, self.pending_events = self.pending_events, None
+        return collected if collected is not None else []
 
     id:UUID
     version:int
-    timestamp:datetime
-    pending_events: deque[Event] = field(init=False)
-    def __post_init__(self):
-        self.pending_events = deque()
+    timestamp:int
+    #Allocated on the first recorded event, so replayed aggregates skip it
+    pending_events: list[Event] | None = field(init=False,default=None)
+
+#__init_subclass__ does not run for Aggregate itself
+Aggregate.__aggregate_topic__ = get_topic(Aggregate)
+_AGGREGATE_REGISTRY[Aggregate.__aggregate_topic__] = Aggregate
 
 
+#Money is held as integer minor units (cents); Decimal only at the API boundary
+MINOR_UNITS = 100
+
+def to_minor_units(amount:Decimal|int) -> int:
+    """
+    Converts a currency amount to integer minor units
+    """
+    if isinstance(amount,int) and not isinstance(amount,bool):
+        return amount * MINOR_UNITS
+    if not isinstance(amount,Decimal):
+        raise TypeError(f"Expected Decimal or int amount, got {type(amount).__name__}")
+    if not amount.is_finite():
+        raise ValueError(f"{amount} is not a currency amount")
+    minor = amount * MINOR_UNITS
+    if minor != minor.to_integral_value():
+        raise ValueError(f"{amount} is finer than the currency's minor unit")
+    return int(minor)
+
+def from_minor_units(minor:int) -> Decimal:
+    """
+    Converts integer minor units back to a currency amount
+    """
+    return Decimal(minor) / MINOR_UNITS
+
 
 # Concrete class
-@dataclass
+@aggregate_dataclass
 class Account(Aggregate):
     full_name:str
     email_address: str
-    balance: Decimal = Decimal("0.00")
-    overdraft_limit: Decimal = Decimal("0.00")
-    is_closed= False
+    balance: int = 0 #Minor units
+    overdraft_limit: int = 0 #Minor units
+    is_closed: bool = False
 
     class Opened(Aggregate.Created):
         full_name:str
         email_address:str
 
     class TransactionAppended(Aggregate.Event):
-        amount:Decimal
-        def apply(self, account:"Account") -> None:
-            account.balance += self.amount
+        amount:int
+        new_balance:int
+        _sets_ = {"balance": "new_balance"}
 
     class OverdraftLimitSet(Aggregate.Event):
-        overdraft_limit:Decimal
-        def apply(self, account:"Account") -> None:
-            account.overdraft_limit= self.overdraft_limit
+        overdraft_limit:int
+        _sets_ = {"overdraft_limit": "overdraft_limit"}
 
     class Closed(Aggregate.Event):
         def apply(self,account:"Account")->None:
@@ -211,7 +554,7 @@ class Account(Aggregate):
         if self.is_closed:
             raise self.AccountClosedError
     def check_has_sufficient_funds(
-        self,amount:Decimal
+        self,amount:int
     ) -> None:
         if self.balance + amount < -self.overdraft_limit:
             raise self.InsufficientFundsError({"account_id":self.id})
@@ -220,23 +563,27 @@ class Account(Aggregate):
         """
         Appends given amount as transaction on account
         """
+        amount = to_minor_units(amount)
         self.check_account_is_not_closed()
-        self.check_has_sufficient_funds(amount)
-        self._trigger_(
+        new_balance = self.balance + amount
+        if new_balance < -self.overdraft_limit:
+            raise self.InsufficientFundsError({"account_id":self.id})
+        self._apply_and_record_(
             self.TransactionAppended,
-            amount=amount
+            amount=amount,
+            new_balance=new_balance,
         )
     def set_overdraft_limit(
         self,overdraft_limit:Decimal
     ) -> None:
         assert overdraft_limit >= Decimal("0.00")
         self.check_account_is_not_closed()
-        self._trigger_(
+        self._apply_and_record_(
             self.OverdraftLimitSet,
-            overdraft_limit=overdraft_limit,
+            overdraft_limit=to_minor_units(overdraft_limit),
         )
     def close(self)->None:
-        self._trigger_(self.Closed)
+        self._apply_and_record_(self.Closed)
     
 
 #Test
@@ -245,11 +592,11 @@ assert account.full_name =="Migo"
 assert account.email_address == "test@mail.com"
 assert account.balance == 0 
 account.append_transaction(Decimal("10"))
-assert account.balance == Decimal("10")
+assert from_minor_units(account.balance) == Decimal("10")
 account.append_transaction(Decimal("10"))
-assert account.balance == Decimal("20")
+assert from_minor_units(account.balance) == Decimal("20")
 account.append_transaction(Decimal("-15.00"))
-assert account.balance == Decimal("5.00")
+assert from_minor_units(account.balance) == Decimal("5.00")
 
 #fail to debit
 try :
@@ -263,7 +610,7 @@ else:
 #Increase the overdraft limit
 account.set_overdraft_limit(Decimal("100.00"))
 account.append_transaction(Decimal("-15.00"))
-assert account.balance == Decimal("-10.00")
+assert account.balance == -1000
 
 #close the account
 account.close()
@@ -276,5 +623,164 @@ except Account.AccountClosedError:
 else:
     raise Exception("Account closed error not raised")
 
+#Amounts finer than a cent are rejected
+try:
+    Account.open(full_name="Migo",email_address="test@mail.com").append_transaction(Decimal("0.001"))
+except ValueError:
+    pass
+else:
+    raise Exception("Sub-cent amount accepted")
+for amount in (Decimal("NaN"), Decimal("Infinity")):
+    try:
+        to_minor_units(amount)
+    except ValueError:
+        pass
+    else:
+        raise Exception("Non-finite amount accepted")
+
+for amount in (0.5, True, "1"):
+    try:
+        to_minor_units(amount)
+    except TypeError:
+        pass
+    else:
+        raise Exception(f"{amount!r} accepted as an amount")
+
+#Whole amounts may be given as int
+whole = Account.open(full_name="Migo",email_address="test@mail.com")
+whole.set_overdraft_limit(5)
+whole.append_transaction(10)
+assert whole.balance == 1000 and whole.overdraft_limit == 500
+
 pending = account._collect_()
-assert len(pending) ==7
\ No newline at end of file
+assert len(pending) ==7
+#Events flatten to rows in field order
+opened = pending[0]
+assert opened._to_row_() == (
+    account.id, 1, opened.timestamp, opened.aggregate_topic, "Migo", "test@mail.com"
+)
+assert all(type(event)._from_row_(event._to_row_()) == event for event in pending)
+
+#Replaying the recorded events rebuilds the same account
+replayed = None
+for event in pending:
+    replayed = event.mutate(replayed)
+assert replayed == account and replayed.is_closed
+assert replayed.pending_events is None and replayed._collect_() == []
+
+#Class variables on a Created event are not passed to the aggregate
+class OpenedWithKind(Account.Opened):
+    kind: ClassVar[str] = "x"
+
+assert OpenedWithKind._extra_fields_ == ("full_name", "email_address")
+assert OpenedWithKind(
+    aggregate_id=account.id, aggregate_version=1, timestamp=0,
+    aggregate_topic=Account.__aggregate_topic__, full_name="Migo", email_address="test@mail.com",
+).mutate(None).full_name == "Migo"
+
+#The base class can create aggregates too
+base = Aggregate._create_(Aggregate.Created)
+assert type(base) is Aggregate and base.version == 1
+
+#Events only mutate aggregates, and only in sequence
+try:
+    account.TransactionAppended(
+        aggregate_id=account.id, aggregate_version=1, timestamp=0, amount=100, new_balance=100
+    ).mutate(None)
+except Aggregate.NotAggregateError:
+    pass
+else:
+    raise Exception("Not aggregate error not raised")
+try:
+    account.TransactionAppended(
+        aggregate_id=account.id, aggregate_version=1, timestamp=0, amount=100, new_balance=100
+    ).mutate(account)
+except Aggregate.VersionError:
+    pass
+else:
+    raise Exception("Version error not raised")
+
+#Aggregate topics resolve through the registry, other topics by import
+assert resolve_topic(Account.__aggregate_topic__) is Account
+assert resolve_topic(get_topic(Account.Opened)) is Account.Opened
+
+#Clock and id sources can be swapped per aggregate class
+@aggregate_dataclass
+class FixedClockAccount(Account):
+    _clock = staticmethod(lambda: 42)
+
+fixed = FixedClockAccount.open(full_name="Migo",email_address="test@mail.com")
+fixed.close()
+assert type(fixed) is FixedClockAccount and fixed.id.version == 4
+assert [event.timestamp for event in fixed._collect_()] == [42, 42]
+
+#Event classes derive their slots from their fields
+try:
+    class SlottedEvent(Aggregate.Event):
+        __slots__ = ("x",)
+        x: int
+except TypeError:
+    pass
+else:
+    raise Exception("Declared __slots__ accepted on an event")
+
+#_sets_ must name fields of the event
+try:
+    class BadSets(Aggregate.Event):
+        _sets_ = {"balance": "y"}
+except TypeError:
+    pass
+else:
+    raise Exception("_sets_ naming a missing field accepted")
+
+#_sets_ needs the generic mutate(), so not on Created events
+try:
+    class Reopened(Account.Opened):
+        _sets_ = {"full_name": "full_name"}
+except TypeError:
+    pass
+else:
+    raise Exception("_sets_ accepted on a Created event")
+
+#Overriding apply() on a _sets_ event holds on replay as on the fast path
+@aggregate_dataclass
+class AuditedAccount(Account):
+    class Audited(Account.TransactionAppended):
+        def apply(self, account:"Account") -> None:
+            account.full_name = "AUDITED"
+
+audited = AuditedAccount.open(full_name="Migo",email_address="test@mail.com")
+audited._apply_and_record_(audited.Audited, amount=0, new_balance=0)
+replayed = None
+for event in audited._collect_():
+    replayed = event.mutate(replayed)
+assert audited.full_name == replayed.full_name == "AUDITED"
+
+#Rebinding apply() on an event class takes effect, e.g. under mock
+from unittest import mock
+patched_account = Account.open(full_name="Migo",email_address="test@mail.com")
+with mock.patch.object(Account.Closed, "apply") as patched:
+    patched_account.close()
+assert patched.called and not patched_account.is_closed
+with mock.patch.object(Account.TransactionAppended, "apply") as patched:
+    patched_account.TransactionAppended(
+        aggregate_id=patched_account.id, aggregate_version=3, timestamp=0, amount=100, new_balance=100
+    ).mutate(patched_account)
+assert patched.called and patched_account.balance == 0
+
+#Restored handlers apply again
+patched_account = Account.open(full_name="Migo",email_address="test@mail.com")
+patched_account.append_transaction(Decimal("1"))
+patched_account.close()
+assert patched_account.balance == 100 and patched_account.is_closed
+
+#Events overriding mutate() are not skipped by the fast path
+mutated = []
+class LoggedClosed(Account.Closed):
+    def mutate(self, obj):
+        mutated.append(self)
+        return super().mutate(obj)
+
+logged = Account.open(full_name="Migo",email_address="test@mail.com")
+logged._apply_and_record_(LoggedClosed)
+assert logged.is_closed and mutated == logged._collect_()[1:]